@@ -1,15 +1,32 @@
 import os
 import io
 import time
+import csv
 import json
+import logging
+import logging.handlers
+import queue
+import random
+import shutil
+import tempfile
+import threading
+import av  # PyAV for keyframe-seek decoding
 import cv2  # OpenCV for video processing
+import httplib2
+import google_auth_httplib2
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from typing import Optional, Tuple
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
+from googleapiclient.http import MediaIoBaseDownload, MediaIoBaseUpload
 from socket import timeout as SocketTimeout  # for robust timeout catching
 
+try:
+    from av.codec.hwaccel import HWAccel, hwdevices_available
+except ImportError:  # PyAV < 14 has no hardware decoding API
+    HWAccel = hwdevices_available = None
+
 # -----------------------------
 # Configuration via environment
 # -----------------------------
@@ -24,12 +41,69 @@ SHEET_NAME = os.getenv("SHEET_NAME", "Sheet1")
 # The frame to capture from the video (in seconds). Can be float.
 CAPTURE_TIMESTAMP_SECONDS = float(os.getenv("CAPTURE_TIMESTAMP_SECONDS", "2"))
 
+# Hardware decoder for PyAV: "auto" picks the first available device type,
+# "none" forces software decoding, anything else names a device (e.g. "cuda").
+HWACCEL = os.getenv("HWACCEL", "auto").lower()
+HWACCEL_PREFERENCE = ("cuda", "videotoolbox", "vaapi", "d3d11va", "qsv")
+
+# Maximum thumbnail width in pixels; frames are scaled down (aspect kept).
+THUMBNAIL_WIDTH = int(os.getenv("THUMBNAIL_WIDTH", "640"))
+
+# JPEG quality (0-100) for the uploaded thumbnails.
+JPEG_QUALITY = int(os.getenv("JPEG_QUALITY", "85"))
+
+# Upper bound (in bytes) on what the keyframe seek may fetch with range
+# requests. Falls back to a full download when the frame needs more than this.
+PARTIAL_DOWNLOAD_BYTES = int(os.getenv("PARTIAL_DOWNLOAD_BYTES", str(16 * 1024 * 1024)))
+
+# Granularity of the range requests issued while demuxing from Drive.
+RANGE_BLOCK_BYTES = 1024 * 1024
+
+# Chunk size for full (fallback) downloads, streamed directly to disk.
+DOWNLOAD_CHUNK_BYTES = 8 * 1024 * 1024
+
+# Number of videos downloaded/processed concurrently.
+MAX_WORKERS = int(os.getenv("MAX_WORKERS", "8"))
+
+# tmpfs used for full downloads when the video fits in memory (Linux).
+SHM_DIR = "/dev/shm"
+
+# Socket timeout (seconds) for API connections.
+HTTP_TIMEOUT_SECONDS = 30
+
+# Local CSV that receives sheet rows which could not be written at the end.
+UNSAVED_ROWS_FILE = os.getenv("UNSAVED_ROWS_FILE", "unsaved_rows.csv")
+
+# Drive accepts at most 100 calls in a single batch request.
+DRIVE_BATCH_LIMIT = 100
+
+# Log level name (DEBUG, INFO, WARNING, ...); progress messages are INFO.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING").upper()
+
+log = logging.getLogger("grabber")
+
 # Scopes define the level of access requested (Drive + Sheets).
 SCOPES = [
     "https://www.googleapis.com/auth/drive",
     "https://www.googleapis.com/auth/spreadsheets",
 ]
 
+def _start_logging():
+    """
+    Routes the module logger through a QueueHandler so worker threads never
+    block on stderr; a background QueueListener does the actual writing.
+    Returns the listener, which must be stopped to flush remaining records.
+    """
+    log_queue = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    log.addHandler(logging.handlers.QueueHandler(log_queue))
+    log.setLevel(LOG_LEVEL)
+    log.propagate = False
+    listener.start()
+    return listener
+
 def _load_credentials():
     """
     Load service account credentials from either:
@@ -50,155 +124,617 @@ def _load_credentials():
     )
     return creds
 
+def _authorized_http(creds):
+    """
+    Returns an authorized, persistent httplib2 connection. Keep-alive lets
+    consecutive calls on the same client skip the TCP + TLS handshake.
+    """
+    return google_auth_httplib2.AuthorizedHttp(
+        creds, http=httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS)
+    )
+
+def _build_service(api, version, creds):
+    """Builds an API client from the bundled discovery document."""
+    return build(
+        api,
+        version,
+        http=_authorized_http(creds),
+        cache_discovery=True,
+        static_discovery=True,
+    )
+
 def authenticate():
     """Authenticate to Google APIs using a Service Account."""
     creds = _load_credentials()
-    drive_service = build("drive", "v3", credentials=creds)
-    sheets_service = build("sheets", "v4", credentials=creds)
+    drive_service = _build_service("drive", "v3", creds)
+    sheets_service = _build_service("sheets", "v4", creds)
     return drive_service, sheets_service
 
+# HTTP statuses worth retrying: rate limiting and transient server errors.
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+
+# Longest single wait between retries, and total time budget for one call.
+MAX_BACKOFF_SECONDS = 60
+RETRY_DEADLINE_SECONDS = 300
+
+def _is_retryable(error):
+    """True for rate-limit/server HttpErrors and socket timeouts."""
+    if isinstance(error, HttpError):
+        return error.resp.status in RETRYABLE_STATUSES
+    return isinstance(error, (SocketTimeout, TimeoutError))
+
+def _retry_after_seconds(error):
+    """Seconds requested by an HttpError's Retry-After header, or 0."""
+    if not isinstance(error, HttpError):
+        return 0.0
+    try:
+        return float(error.resp.get("retry-after") or 0)
+    except (TypeError, ValueError):  # HTTP-date form; fall back to backoff
+        return 0.0
+
+def _backoff_delay(attempt, error=None):
+    """
+    Exponential backoff capped at MAX_BACKOFF_SECONDS, or the server's
+    Retry-After if longer, plus up to a second of random jitter.
+    """
+    backoff = min(2 ** attempt, MAX_BACKOFF_SECONDS)
+    return max(_retry_after_seconds(error), backoff) + random.uniform(0, 1)
+
+def _call_with_retry(fn, *, retries=5):
+    """
+    Calls fn() (e.g. a request's bound .execute) and returns its result,
+    retrying rate-limit/server errors and timeouts with jittered backoff.
+    Gives up early once the waits would exceed RETRY_DEADLINE_SECONDS.
+    """
+    deadline = time.monotonic() + RETRY_DEADLINE_SECONDS
+    for attempt in range(retries):
+        try:
+            return fn()
+        except (HttpError, SocketTimeout, TimeoutError) as error:
+            if not _is_retryable(error) or attempt + 1 == retries:
+                raise
+            delay = _backoff_delay(attempt, error)
+            if time.monotonic() + delay > deadline:
+                raise
+            log.warning("  ⚠️ Attempt %d failed: %s. Retrying in %.1f seconds...", attempt + 1, error, delay)
+            time.sleep(delay)
+
+# Per-thread API clients for the video worker pool.
+_thread_local = threading.local()
+
+def _worker_drive_service():
+    """
+    Returns a Drive client owned by the calling thread. httplib2 connections
+    are not thread-safe, so each worker keeps its own pooled AuthorizedHttp.
+    """
+    drive_service = getattr(_thread_local, "drive_service", None)
+    if drive_service is None:
+        drive_service = _build_service("drive", "v3", _load_credentials())
+        _thread_local.drive_service = drive_service
+    return drive_service
+
+# Rows waiting to be written to the sheet in a single append call.
+_pending_rows = []
+
 def append_to_sheet(sheets_service, data_row):
     """
     Appends a row of data to the Google Sheet with an automatic retry mechanism.
     """
     if not data_row:
         return
+    _append_rows(sheets_service, [list(data_row)])
 
-    max_retries = 5
-    backoff_seconds = 2  # Initial wait time
+def flush_sheet(sheets_service, batch_size=500):
+    """
+    Writes all buffered rows in one append call once at least batch_size rows
+    are pending. Pass batch_size=0 to drain whatever is left. Rows that fail
+    to write are kept in the buffer, or saved to UNSAVED_ROWS_FILE when
+    draining, so they are never dropped.
+    """
+    if not _pending_rows or len(_pending_rows) < batch_size:
+        return
+    rows = list(_pending_rows)
+    _pending_rows.clear()
+    if _append_rows(sheets_service, rows):
+        return
 
-    for attempt in range(max_retries):
-        try:
-            body = {"values": [list(data_row)]}
-            sheets_service.spreadsheets().values().append(
-                spreadsheetId=SPREADSHEET_ID,
-                range=f"{SHEET_NAME}!A1",
-                valueInputOption="USER_ENTERED",
-                insertDataOption="INSERT_ROWS",
-                body=body,
-            ).execute()
-            print("  ✍️ Successfully wrote to sheet.")
-            return  # Exit on success
-
-        except (HttpError, TimeoutError, SocketTimeout) as error:
-            print(f"  ⚠️ Attempt {attempt + 1} failed: {error}")
-            if attempt + 1 == max_retries:
-                print("  ❌ Max retries reached. Could not write to sheet.")
+    if batch_size:
+        _pending_rows[:0] = rows  # retried with the next flush
+        return
+    with open(UNSAVED_ROWS_FILE, "a", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(rows)
+    log.error("  ❌ Saved %d unwritten row(s) to %s.", len(rows), UNSAVED_ROWS_FILE)
+
+def _append_rows(sheets_service, rows):
+    """
+    Appends rows to the Google Sheet in one call, retrying on failure.
+    Returns True when the rows were written.
+    """
+    request = sheets_service.spreadsheets().values().append(
+        spreadsheetId=SPREADSHEET_ID,
+        range=f"{SHEET_NAME}!A1",
+        valueInputOption="USER_ENTERED",
+        insertDataOption="INSERT_ROWS",
+        body={"values": rows},
+    )
+    try:
+        _call_with_retry(request.execute)
+        log.info("  ✍️ Successfully wrote %d row(s) to sheet.", len(rows))
+        return True
+    except (HttpError, OSError, httplib2.HttpLib2Error) as error:
+        log.error("  ❌ Could not write to sheet: %s", error)
+        return False
+
+class _DriveRangeReader(io.RawIOBase):
+    """
+    Read-only, seekable file object over a Drive file that fetches just the
+    blocks a reader touches with HTTP range requests. For a video this is the
+    container index plus the GOP around the seek target, wherever they sit.
+    Once PARTIAL_DOWNLOAD_BYTES have been fetched, reads report end-of-file
+    and budget_exhausted is set.
+    """
+
+    def __init__(self, drive_service, file_id):
+        super().__init__()
+        request = drive_service.files().get_media(fileId=file_id, supportsAllDrives=True)
+        self._http = drive_service._http
+        self._uri = request.uri
+        self._blocks = {}
+        self._fetched = 0
+        self._pos = 0
+        self._size = None
+        self.budget_exhausted = False
+        self._fetch_block(0)  # the first response also reports the total size
+
+    def _fetch_block(self, index):
+        resp, content = _call_with_retry(lambda: self._request_block(index))
+        if resp.status == 200:
+            # Range ignored: the whole (small) file came back in one go
+            self._size = len(content)
+            for offset in range(0, len(content), RANGE_BLOCK_BYTES):
+                self._blocks[offset // RANGE_BLOCK_BYTES] = content[offset:offset + RANGE_BLOCK_BYTES]
+            self._blocks.setdefault(index, b"")
+            return
+
+        if self._size is None:
+            total = resp.get("content-range", "").rpartition("/")[2]
+            self._size = int(total) if total.isdigit() else None
+        self._fetched += len(content)
+        self._blocks[index] = content
+
+    def _request_block(self, index):
+        start = index * RANGE_BLOCK_BYTES
+        resp, content = self._http.request(
+            self._uri, headers={"Range": f"bytes={start}-{start + RANGE_BLOCK_BYTES - 1}"}
+        )
+        if resp.status not in (200, 206):
+            raise HttpError(resp, content, uri=self._uri)
+        return resp, content
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        elif whence == io.SEEK_END:
+            if self._size is None:
+                raise OSError("File size unknown; cannot seek from end")
+            self._pos = self._size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        return self._pos
+
+    def readinto(self, buffer):
+        written = 0
+        while written < len(buffer):
+            if self._size is not None and self._pos >= self._size:
                 break
+            index, offset = divmod(self._pos, RANGE_BLOCK_BYTES)
+            if index not in self._blocks:
+                # Raising inside PyAV's read callback only dumps a traceback;
+                # signal EOF instead and let the caller check the flag
+                if self._fetched + RANGE_BLOCK_BYTES > PARTIAL_DOWNLOAD_BYTES:
+                    self.budget_exhausted = True
+                    break
+                self._fetch_block(index)
+            chunk = self._blocks[index][offset:offset + len(buffer) - written]
+            if not chunk:
+                break
+            buffer[written:written + len(chunk)] = chunk
+            written += len(chunk)
+            self._pos += len(chunk)
+        return written
+
+def _download_full(drive_service, file_id, dest_path):
+    """Streams the whole video straight to dest_path in chunks."""
+    request = drive_service.files().get_media(fileId=file_id, supportsAllDrives=True)
+    with open(dest_path, "wb") as fh:
+        downloader = MediaIoBaseDownload(fh, request, chunksize=DOWNLOAD_CHUNK_BYTES)
+        done = False
+        last_decile = -1
+        while not done:
+            status, done = _call_with_retry(downloader.next_chunk)
+            # Report progress in 10% steps only
+            if status and int(status.progress() * 10) != last_decile:
+                last_decile = int(status.progress() * 10)
+                log.debug("  Download %d%%.", int(status.progress() * 100))
+
+def _thumbnail_size(width, height):
+    """Returns (width, height) scaled down to at most THUMBNAIL_WIDTH wide."""
+    if width <= THUMBNAIL_WIDTH:
+        return width, height
+    return THUMBNAIL_WIDTH, max(2, round(height * THUMBNAIL_WIDTH / width / 2) * 2)
+
+def _detect_hwaccel():
+    """Picks the hardware decoder device type once at startup, or None."""
+    if hwdevices_available is None or HWACCEL == "none":
+        return None
+    available = hwdevices_available()
+    candidates = HWACCEL_PREFERENCE if HWACCEL == "auto" else (HWACCEL,)
+    return next((device for device in candidates if device in available), None)
 
-            print(f"  Retrying in {backoff_seconds} seconds...")
-            time.sleep(backoff_seconds)
-            backoff_seconds *= 2  # Exponential backoff
+_hwaccel_device = _detect_hwaccel()
+
+def _open_video(source):
+    """
+    Opens a path or file object with PyAV, decoding on the detected hardware
+    device when there is one. Hardware decoding is switched off for the rest
+    of the run only when the same source then opens fine in software; data
+    errors (corrupt file, exhausted range budget) propagate to the caller.
+    """
+    global _hwaccel_device
+    device = _hwaccel_device
+    if device is None:
+        return av.open(source)
+
+    try:
+        return av.open(source, hwaccel=HWAccel(device_type=device, allow_software_fallback=True))
+    except av.error.FFmpegError as error:
+        if hasattr(source, "seek"):
+            source.seek(0)
+        container = av.open(source)  # raises if the source itself is unreadable
+        log.warning("  ⚠️ Hardware decoding (%s) unavailable, using software: %s", device, error)
+        _hwaccel_device = None
+        return container
+
+def _capture_time(video_file):
+    """
+    Returns the capture timestamp in seconds, clamped to the video's length
+    when Drive reports its duration via videoMediaMetadata.
+    """
+    duration_ms = video_file.get("videoMediaMetadata", {}).get("durationMillis")
+    if not duration_ms:
+        return CAPTURE_TIMESTAMP_SECONDS
+    return max(0.0, min(CAPTURE_TIMESTAMP_SECONDS, int(duration_ms) / 1000 - 0.1))
+
+def _grab_frame_pyav(source, target_seconds):
+    """
+    Seeks to the keyframe nearest target_seconds and decodes a single frame
+    from a path or file object. Returns a BGR image, or None if the frame is
+    not reachable (e.g. range budget exhausted, unseekable file).
+    """
+    try:
+        with _open_video(source) as container:
+            stream = container.streams.video[0]
+            target = int(target_seconds / stream.time_base) + (stream.start_time or 0)
+            # Only keyframes are needed after a keyframe seek
+            stream.codec_context.skip_frame = "NONKEY"
+            container.seek(target, stream=stream, any_frame=False)
+            frame = next(container.decode(stream), None)
+            if frame is None:
+                return None
+            width, height = _thumbnail_size(frame.width, frame.height)
+            return frame.reformat(width=width, height=height, format="bgr24").to_ndarray()
+    except (av.error.FFmpegError, HttpError, OSError, IndexError, ValueError):
+        return None
+
+def _grab_frame_opencv(video_path, file_name, target_seconds):
+    """
+    Decodes the frame at target_seconds with OpenCV, stepping through the
+    stream. Last resort for files PyAV cannot seek in.
+    """
+    vidcap = cv2.VideoCapture(video_path)
+    target_ms = target_seconds * 1000
+
+    # Let the backend jump close to the target if it can, then advance with
+    # grab() (no colour conversion) and only retrieve() the target frame.
+    vidcap.set(cv2.CAP_PROP_POS_MSEC, target_ms)
+    grabbed = vidcap.grab()
+    while grabbed and vidcap.get(cv2.CAP_PROP_POS_MSEC) < target_ms:
+        grabbed = vidcap.grab()
+    success, image = vidcap.retrieve() if grabbed else (False, None)
+    vidcap.release()
+
+    if not success or image is None:
+        log.warning("  ❌ Could not grab frame from %s.", file_name)
+        return None
+
+    height, width = image.shape[:2]
+    size = _thumbnail_size(width, height)
+    if size != (width, height):
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    return image
+
+def _thumbnail_name(file_name):
+    """Name of the thumbnail uploaded for a video (also its sheet key)."""
+    return f"{os.path.splitext(file_name)[0]}_Thumbnail.jpg"
+
+def _make_workdir(video_file):
+    """
+    Creates a temp directory for one video. It is placed in RAM-backed
+    SHM_DIR when that exists and has room for every worker's download.
+    """
+    size = int(video_file.get("size") or 0)
+    if size and os.path.isdir(SHM_DIR):
+        try:
+            if shutil.disk_usage(SHM_DIR).free > size * MAX_WORKERS:
+                return tempfile.mkdtemp(prefix="grab_", dir=SHM_DIR)
+        except OSError:
+            pass
+    return tempfile.mkdtemp(prefix="grab_")
 
 def process_video(drive_service, video_file, folder_path) -> Optional[Tuple[str, str, str]]:
     """
-    Downloads a video, captures a thumbnail frame, uploads it to Drive,
-    and returns (thumbnail_name, original_path, webViewLink).
+    Reads just enough of a video to capture a thumbnail frame, uploads it to
+    Drive, and returns (thumbnail_name, original_path, webViewLink).
     """
     file_id = video_file.get("id")
     file_name = video_file.get("name")
-    print(f"Processing video: {file_name}")
+    log.info("Processing video: %s", file_name)
 
-    temp_video_path = None
-    thumbnail_path = None
+    # Private work directory, so parallel workers never share temp paths
+    workdir = _make_workdir(video_file)
+    temp_video_path = os.path.join(workdir, f"video{os.path.splitext(file_name)[1]}")
 
     try:
-        # Download the video file into memory
-        request = drive_service.files().get_media(fileId=file_id)
-        fh = io.BytesIO()
-        downloader = MediaIoBaseDownload(fh, request)
-        done = False
-        while not done:
-            status, done = downloader.next_chunk()
-            if status:
-                print(f"  Download {int(status.progress() * 100)}%.")
-
-        fh.seek(0)
-
-        # Create a temporary file path to work with OpenCV
-        temp_video_path = f"temp_{file_name}"
-        with open(temp_video_path, "wb") as f:
-            f.write(fh.read())
-
-        # Use OpenCV to capture a frame
-        vidcap = cv2.VideoCapture(temp_video_path)
-        fps = vidcap.get(cv2.CAP_PROP_FPS)
-        if not fps or fps == 0:
-            print(f"  ❌ Could not get FPS for {file_name}. Skipping.")
-            vidcap.release()
-            return None
-
-        frame_id = int(fps * CAPTURE_TIMESTAMP_SECONDS)
-        vidcap.set(cv2.CAP_PROP_POS_FRAMES, frame_id)
-        success, image = vidcap.read()
-        vidcap.release()
-
-        if not success or image is None:
-            print(f"  ❌ Could not grab frame from {file_name}.")
+        target_seconds = _capture_time(video_file)
+
+        # Demux straight from Drive, fetching only the index and target GOP
+        with _DriveRangeReader(drive_service, file_id) as reader:
+            image = _grab_frame_pyav(reader, target_seconds)
+
+        if image is None:
+            if reader.budget_exhausted:
+                log.info("  ↩️ Range budget exhausted before the frame; fetching full video.")
+            else:
+                log.info("  ↩️ Frame not reachable with range requests; fetching full video.")
+            _download_full(drive_service, file_id, temp_video_path)
+            image = _grab_frame_pyav(temp_video_path, target_seconds)
+        if image is None:
+            image = _grab_frame_opencv(temp_video_path, file_name, target_seconds)
+            if image is None:
+                return None
+
+        # Encode the frame as a JPEG thumbnail in memory
+        thumbnail_name = _thumbnail_name(file_name)
+        encoded, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+        if not encoded:
+            log.warning("  ❌ Could not encode thumbnail for %s.", file_name)
             return None
 
-        # Save the frame as a thumbnail image
-        thumbnail_name = f"{os.path.splitext(file_name)[0]}_Thumbnail.jpg"
-        thumbnail_path = f"temp_{thumbnail_name}"
-        cv2.imwrite(thumbnail_path, image)
-
         # Upload the thumbnail to Google Drive
-        print(f"  ⬆️ Uploading thumbnail: {thumbnail_name}")
+        log.info("  ⬆️ Uploading thumbnail: %s", thumbnail_name)
         file_metadata = {
             "name": thumbnail_name,
             "parents": [THUMBNAIL_FOLDER_ID],
         }
-        media = MediaFileUpload(thumbnail_path, mimetype="image/jpeg", resumable=True)
+        media = MediaIoBaseUpload(
+            io.BytesIO(buffer.tobytes()),
+            mimetype="image/jpeg",
+            resumable=True,
+            chunksize=1024 * 1024,
+        )
 
-        uploaded_thumbnail = drive_service.files().create(
-            body=file_metadata,
-            media_body=media,
-            fields="id, name, webViewLink",
-            supportsAllDrives=True,
-        ).execute()
+        uploaded_thumbnail = _call_with_retry(
+            drive_service.files().create(
+                body=file_metadata,
+                media_body=media,
+                fields="id, name, webViewLink",
+                supportsAllDrives=True,
+            ).execute
+        )
 
-        print(f"  ✅ Thumbnail created with ID: {uploaded_thumbnail.get('id')}")
+        log.info("  ✅ Thumbnail created with ID: %s", uploaded_thumbnail.get("id"))
         return uploaded_thumbnail.get("name"), folder_path, uploaded_thumbnail.get("webViewLink")
 
-    except HttpError as error:
-        print(f"An error occurred: {error}")
+    except (HttpError, TimeoutError, SocketTimeout) as error:
+        log.error("An error occurred: %s", error)
         return None
 
     finally:
         # Clean up local temporary files
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def _process_video_worker(video_file, folder_path):
+    """
+    Runs process_video on a worker thread with that thread's Drive client.
+    Any failure is logged and confined to this video.
+    """
+    try:
+        return process_video(_worker_drive_service(), video_file, folder_path)
+    except Exception:
+        log.exception("An error occurred while processing %s", video_file.get("name"))
+        return None
+
+# Server-side filters so each folder listing returns only what we act on.
+SUBFOLDER_QUERY = "mimeType='application/vnd.google-apps.folder'"
+VIDEO_QUERY = "mimeType contains 'video/'"
+
+def _list_children_request(drive_service, folder_id, query, page_token=None):
+    """Builds (without executing) a files().list call for a folder's children."""
+    return drive_service.files().list(
+        q=f"'{folder_id}' in parents and trashed=false and {query}",
+        pageSize=1000,
+        pageToken=page_token,
+        fields="nextPageToken, files(id, name, mimeType, size, videoMediaMetadata(durationMillis))",
+        supportsAllDrives=True,
+        includeItemsFromAllDrives=True,
+        corpora="allDrives",
+    )
+
+def _execute_batch(drive_service, requests, *, retries=5):
+    """
+    Executes Drive requests in batches of up to DRIVE_BATCH_LIMIT calls per
+    HTTP round-trip. Sub-requests that hit rate limits are re-sent in a later
+    batch, within the same RETRY_DEADLINE_SECONDS budget _call_with_retry
+    uses. Returns the responses in request order; calls that failed are
+    reported and come back as None.
+    """
+    responses = [None] * len(requests)
+    pending = list(range(len(requests)))
+    deadline = time.monotonic() + RETRY_DEADLINE_SECONDS
+
+    for attempt in range(retries):
+        retry = []
+
+        def _on_resp(request_id, response, exception):
+            index = int(request_id)
+            if exception is None:
+                responses[index] = response
+            elif _is_retryable(exception) and attempt + 1 < retries:
+                retry.append((index, exception))
+            else:
+                log.error("An error occurred: %s", exception)
+
+        for start in range(0, len(pending), DRIVE_BATCH_LIMIT):
+            batch = drive_service.new_batch_http_request(callback=_on_resp)
+            for index in pending[start:start + DRIVE_BATCH_LIMIT]:
+                batch.add(requests[index], request_id=str(index))
+            _call_with_retry(batch.execute)
+
+        if not retry:
+            break
+        delay = max(_backoff_delay(attempt, exception) for _, exception in retry)
+        if time.monotonic() + delay > deadline:
+            for _, exception in retry:
+                log.error("An error occurred: %s", exception)
+            break
+        time.sleep(delay)
+        pending = [index for index, _ in retry]
+
+    return responses
+
+def _list_children(drive_service, listings):
+    """
+    Runs several (folder_id, query, first_page) listings through batched
+    requests, following nextPageToken until every listing is complete.
+    first_page is an already fetched first response, or None to fetch it.
+    Returns one item list per listing, or None where it failed.
+    """
+    children = [[] for _ in listings]
+    pending = []
+    for index, (_, _, first_page) in enumerate(listings):
+        if first_page is None:
+            pending.append((index, None))
+            continue
+        children[index].extend(first_page.get("files", []))
+        if first_page.get("nextPageToken"):
+            pending.append((index, first_page["nextPageToken"]))
+
+    while pending:
+        requests = [
+            _list_children_request(drive_service, *listings[index][:2], page_token)
+            for index, page_token in pending
+        ]
         try:
-            if temp_video_path and os.path.exists(temp_video_path):
-                os.remove(temp_video_path)
-            if thumbnail_path and os.path.exists(thumbnail_path):
-                os.remove(thumbnail_path)
-        except Exception as cleanup_err:
-            print(f"  (cleanup warning) {cleanup_err}")
-
-def traverse_folder(drive_service, sheets_service, folder_id, current_path):
-    """Recursively traverses folders to find and process videos."""
-    query = f"'{folder_id}' in parents and trashed=false"
+            responses = _execute_batch(drive_service, requests)
+        except (HttpError, OSError, httplib2.HttpLib2Error) as error:
+            log.error("An error occurred: %s", error)
+            responses = [None] * len(pending)
+
+        next_pending = []
+        for (index, _), response in zip(pending, responses):
+            if response is None:
+                children[index] = None
+                continue
+            children[index].extend(response.get("files", []))
+            page_token = response.get("nextPageToken")
+            if page_token:
+                next_pending.append((index, page_token))
+        pending = next_pending
+
+    return children
+
+def _collect_results(sheets_service, futures):
+    """Queues the sheet rows produced by finished video futures."""
+    for future in futures:
+        log_data = future.result()
+        log.debug("Data to be logged: %s", log_data)
+        if log_data:
+            _pending_rows.append(list(log_data))
+            flush_sheet(sheets_service)
+
+def traverse_folder(
+    drive_service,
+    sheets_service,
+    folder_id,
+    current_path,
+    first_pages=(None, None),
+    processed=frozenset(),
+):
+    """
+    Walks the folder tree iteratively and processes every video found. Each
+    folder gets two filtered listings (subfolders, videos), fully paginated
+    and batched for many folders at once; videos go to a worker pool as soon
+    as they are discovered. first_pages may carry the start folder's already
+    fetched (subfolder, video) first pages. Videos whose (thumbnail name,
+    folder path) pair is in processed are skipped.
+    """
+    stack = [(folder_id, current_path, first_pages)]
+    executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+    futures = set()
+
     try:
-        results = drive_service.files().list(
-            q=query,
-            fields="nextPageToken, files(id, name, mimeType)",
-            supportsAllDrives=True,
-            includeItemsFromAllDrives=True,
-            corpora="allDrives",
-        ).execute()
-        items = results.get("files", [])
-
-        for item in items:
-            item_path = f"{current_path}/{item.get('name')}"
-            mime = item.get("mimeType", "")
-            if mime == "application/vnd.google-apps.folder":
-                traverse_folder(drive_service, sheets_service, item.get("id"), item_path)
-            elif mime.startswith("video/"):
-                log_data = process_video(drive_service, item, current_path)
-                print(f"DEBUGGING - Data to be logged: {log_data}")
-                append_to_sheet(sheets_service, log_data)
+        while stack:
+            # Two listings per folder, so half a batch worth of folders
+            level = stack[-(DRIVE_BATCH_LIMIT // 2):]
+            del stack[-(DRIVE_BATCH_LIMIT // 2):]
+            listings = []
+            for level_id, _, (subfolder_page, video_page) in level:
+                listings.append((level_id, SUBFOLDER_QUERY, subfolder_page))
+                listings.append((level_id, VIDEO_QUERY, video_page))
+            children = _list_children(drive_service, listings)
+
+            discovered = []
+            for index, (_, path, _) in enumerate(level):
+                subfolders, videos = children[2 * index], children[2 * index + 1]
+                for item in subfolders or []:
+                    stack.append((item.get("id"), f"{path}/{item.get('name')}", (None, None)))
+                discovered.extend(
+                    (item, path)
+                    for item in videos or []
+                    if (_thumbnail_name(item.get("name", "")), path) not in processed
+                )
+
+            # Largest first, so small videos backfill idle workers at the end
+            discovered.sort(key=lambda entry: int(entry[0].get("size") or 0), reverse=True)
+            for item, path in discovered:
+                futures.add(executor.submit(_process_video_worker, item, path))
+
+            # Record whatever has finished while the tree is still being listed
+            done, futures = wait(futures, timeout=0)
+            _collect_results(sheets_service, done)
+
+        while futures:
+            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+            _collect_results(sheets_service, done)
 
-    except HttpError as error:
-        print(f"An error occurred: {error}")
+    finally:
+        # On an error or interrupt, drop the videos that have not started but
+        # still record those that finished or are uploading right now
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=True)
+        _collect_results(sheets_service, [future for future in futures if not future.cancelled()])
 
 def main():
     """Main function to orchestrate the process."""
@@ -213,26 +749,59 @@ def main():
 
     drive_service, sheets_service = authenticate()
 
-    # Optional: ensure header row exists
+    # Read the Thumbnail Name and Video Path columns once: ensures the header
+    # row exists and lets the scan skip videos logged by earlier runs
+    processed = set()
     try:
-        result = sheets_service.spreadsheets().values().get(
-            spreadsheetId=SPREADSHEET_ID, range=SHEET_NAME
-        ).execute()
-        if not result.get("values"):
+        result = _call_with_retry(
+            sheets_service.spreadsheets().values().get(
+                spreadsheetId=SPREADSHEET_ID, range=f"{SHEET_NAME}!A:B"
+            ).execute
+        )
+        rows = result.get("values", [])
+        if not rows:
             append_to_sheet(
                 sheets_service, ["Thumbnail Name", "Original Video Path", "Link to Thumbnail"]
             )
+        processed = {(row[0], row[1] if len(row) > 1 else "") for row in rows[1:] if row}
+        log.info("Found %d already processed video(s).", len(processed))
     except HttpError as error:
-        print(f"Could not check sheet, creating a new one might be needed. Error: {error}")
-
-    # Resolve root folder name and traverse
-    root_folder = drive_service.files().get(
-        fileId=START_FOLDER_ID, fields="name", supportsAllDrives=True
-    ).execute()
+        log.warning("Could not check sheet, creating a new one might be needed. Error: %s", error)
+
+    # Resolve root folder name and its listings in one batch, then traverse
+    root_folder, root_subfolders, root_videos = _execute_batch(
+        drive_service,
+        [
+            drive_service.files().get(
+                fileId=START_FOLDER_ID, fields="name", supportsAllDrives=True
+            ),
+            _list_children_request(drive_service, START_FOLDER_ID, SUBFOLDER_QUERY),
+            _list_children_request(drive_service, START_FOLDER_ID, VIDEO_QUERY),
+        ],
+    )
+    if root_folder is None:
+        raise RuntimeError(
+            f"Could not access START_FOLDER_ID {START_FOLDER_ID}. Check the ID and sharing."
+        )
     root_name = root_folder.get("name", "<root>")
-    print(f"🚀 Starting scan in root folder: {root_name}")
-    traverse_folder(drive_service, sheets_service, START_FOLDER_ID, root_name)
-    print("✨ Process complete.")
+    log.info("🚀 Starting scan in root folder: %s", root_name)
+    try:
+        traverse_folder(
+            drive_service,
+            sheets_service,
+            START_FOLDER_ID,
+            root_name,
+            (root_subfolders, root_videos),
+            processed,
+        )
+    finally:
+        # Record every uploaded thumbnail, even if the scan is interrupted
+        flush_sheet(sheets_service, batch_size=0)
+    log.info("✨ Process complete.")
 
 if __name__ == "__main__":
-    main()
+    log_listener = _start_logging()
+    try:
+        main()
+    finally:
+        log_listener.stop()